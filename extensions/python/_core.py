@@ -0,0 +1,1182 @@
+"""
+Shared core of the Python bridge servers.
+
+Provides the context, registry and JSON-RPC loop used by both
+`server.py` (which loads a user registry file) and
+`python_bridge_server.py` (a self-contained registry template).
+Communicates via stdin/stdout with newline-delimited JSON.
+"""
+
+import dataclasses
+import datetime
+import enum
+import fnmatch
+import inspect
+import json
+import os
+import re
+import sys
+import traceback
+import uuid
+from bisect import bisect_left
+from collections import OrderedDict
+from functools import lru_cache
+from types import MappingProxyType
+from typing import (
+    Any,
+    BinaryIO,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
+
+@lru_cache(maxsize=None)
+def _numpy() -> Any:
+    """Import NumPy on first use, returning the module or None.
+
+    Deferred so that bridges without ``numeric=True`` assertions start fast.
+    """
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def _json_default(obj: Any) -> Any:
+    """Encode the non-JSON types orjson supports natively the same way.
+
+    Keeps results identical whether or not orjson is installed: datetimes as
+    ISO 8601, UUIDs as strings, enums by value, dataclasses as dicts and
+    NumPy scalars and arrays as their Python equivalents.
+    """
+    if isinstance(obj, (datetime.datetime, datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    if isinstance(obj, enum.Enum):
+        return obj.value
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return {f.name: getattr(obj, f.name) for f in dataclasses.fields(obj)}
+    # NumPy values can only exist if something already imported it
+    np = sys.modules.get("numpy")
+    if np is not None and isinstance(obj, (np.generic, np.ndarray)):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# orjson is an optional, much faster drop-in for the request/response hot path.
+# Both variants decode str or bytes and encode to UTF-8 bytes. orjson only
+# handles 64-bit integers, so anything it rejects or might round goes through
+# the stdlib instead.
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+    # 19+ digit runs may be integers outside the 64-bit range
+    _LONG_DIGITS = re.compile(rb"\d{19}")
+
+    def _loads(data: Any) -> Any:
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        if _LONG_DIGITS.search(data) is not None:
+            return json.loads(data)
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # Let the stdlib decide (it accepts NaN/Infinity, for one)
+            return json.loads(data)
+
+    def _dumps(obj: Any) -> bytes:
+        try:
+            return orjson.dumps(obj, default=_json_default, option=_ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            return json.dumps(obj, default=_json_default).encode("utf-8")
+
+else:
+    _loads = json.loads
+
+    def _dumps(obj: Any) -> bytes:
+        return json.dumps(obj, default=_json_default).encode("utf-8")
+
+
+@lru_cache(maxsize=None)
+def _numba() -> Optional[Tuple[Callable, type]]:
+    """Import Numba on first use, returning ``(njit, NumbaError)`` or None.
+
+    Deferred so that bridges without ``numba=True`` functions start fast.
+    """
+    # Compiled kernels are cached on disk so a freshly spawned server does not
+    # pay the compile cost again. Numba reads this when it is first imported,
+    # and only then is the environment touched.
+    os.environ.setdefault(
+        "NUMBA_CACHE_DIR",
+        os.path.join(
+            os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"),
+            "testing-actions",
+            "numba",
+        ),
+    )
+    try:
+        from numba import njit
+        from numba.core.errors import NumbaError
+    except ImportError:
+        return None
+    return njit, NumbaError
+
+
+class RawJson:
+    """Already-encoded JSON that the encoder splices into a response as is.
+
+    Handlers may return one as their whole result to skip re-encoding cached
+    output on every call.
+    """
+
+    __slots__ = ("data",)
+
+    def __init__(self, data: bytes):
+        self.data = data
+
+
+# String values at least this long keep their encoded form for ctx.get
+_RAW_JSON_MIN_SIZE = 4096
+
+
+class _KeyIndex:
+    """Sorted views of the context keys for prefix and suffix lookups.
+
+    ``keys`` is sorted forward and ``rkeys`` holds each key reversed, so both
+    ``prefix*`` and ``*suffix`` become a bisect plus a walk over the matches.
+    Maintenance is lazy to keep Context.set cheap: new keys queue in
+    ``pending`` and are merged at the next lookup, deleted keys stay behind
+    as stale entries (filtered against the live data) until they make up
+    half the index, at which point it is rebuilt. Context drops the index
+    altogether once the backlog outgrows the data, so churn between lookups
+    cannot grow it without bound.
+    """
+
+    __slots__ = ("keys", "rkeys", "pending", "stale")
+
+    def __init__(self, data: Dict[str, Any]):
+        self._build(data)
+
+    def _build(self, data: Dict[str, Any]) -> None:
+        self.keys = sorted(key for key in data if type(key) is str)
+        self.rkeys = sorted(key[::-1] for key in self.keys)
+        self.pending: Set[str] = set()
+        self.stale = 0
+
+    def add(self, key: str) -> None:
+        # A key deleted and set again may still be indexed as a stale entry
+        if key in self.pending:
+            return
+        keys = self.keys
+        i = bisect_left(keys, key)
+        if i == len(keys) or keys[i] != key:
+            self.pending.add(key)
+
+    def backlog(self) -> int:
+        return len(self.pending) + self.stale
+
+    def _refresh(self, data: Dict[str, Any]) -> None:
+        if self.stale > len(self.keys) // 2:
+            self._build(data)
+        elif self.pending:
+            # Timsort merges the sorted run and the appended tail in linear time
+            pending = self.pending
+            self.keys.extend(pending)
+            self.keys.sort()
+            self.rkeys.extend(key[::-1] for key in pending)
+            self.rkeys.sort()
+            self.pending = set()
+
+    def starting_with(self, prefix: str, data: Dict[str, Any]) -> List[str]:
+        self._refresh(data)
+        matches = _scan_sorted(self.keys, prefix)
+        return [key for key in dict.fromkeys(matches) if key in data]
+
+    def ending_with(self, suffix: str, data: Dict[str, Any]) -> List[str]:
+        self._refresh(data)
+        matches = _scan_sorted(self.rkeys, suffix[::-1])
+        return [key for key in dict.fromkeys(m[::-1] for m in matches) if key in data]
+
+
+def _scan_sorted(keys: List[str], prefix: str) -> List[str]:
+    start = end = bisect_left(keys, prefix)
+    while end < len(keys) and keys[end].startswith(prefix):
+        end += 1
+    return keys[start:end]
+
+
+class Context:
+    """Shared context for function calls."""
+
+    __slots__ = (
+        "_data",
+        "_index",
+        "_encoded",
+        "_steps",
+        "_version",
+        "run_id",
+        "job_name",
+        "step_name",
+        "clock",
+    )
+
+    def __init__(self):
+        self._data: Dict[str, Any] = {}
+        # Built on the first prefix/suffix clear; see _KeyIndex
+        self._index: Optional[_KeyIndex] = None
+        self._encoded: Dict[str, bytes] = {}
+        # Bumped whenever the stored data changes; see PureCallable
+        self._version = 0
+        self._steps: Dict[str, Dict[str, Any]] = {}
+        self.run_id: str = ""
+        self.job_name: str = ""
+        self.step_name: str = ""
+        self.clock: Optional[Dict[str, Any]] = None
+
+    def now(self):
+        """Get current time (respects mock clock if set)."""
+        from datetime import datetime
+        if self.clock and self.clock.get("virtual_time_ms"):
+            return datetime.fromtimestamp(self.clock["virtual_time_ms"] / 1000)
+        return datetime.now()
+
+    def is_clock_mocked(self) -> bool:
+        """Check if mock clock is active."""
+        return self.clock is not None and self.clock.get("virtual_time_ms") is not None
+
+    def get(self, key: str) -> Optional[Any]:
+        """Get a value from context."""
+        return self._data.get(key)
+
+    def get_json(self, key: str) -> Optional[bytes]:
+        """Get the encoded JSON of a large string value, or None.
+
+        The encoding is cached until the value changes. Only strings qualify,
+        since other values can be mutated in place behind the cache's back.
+        """
+        encoded = self._encoded.get(key)
+        if encoded is None:
+            value = self._data.get(key)
+            if type(value) is not str or len(value) < _RAW_JSON_MIN_SIZE:
+                return None
+            encoded = self._encoded[key] = _dumps(value)
+        return encoded
+
+    def set(self, key: str, value: Any) -> None:
+        """Set a value in context."""
+        index = self._index
+        if index is not None and key not in self._data and type(key) is str:
+            index.add(key)
+            if index.backlog() > len(self._data):
+                self._index = None
+        self._data[key] = value
+        self._encoded.pop(key, None)
+        self._version += 1
+
+    def remove(self, key: str) -> bool:
+        """Remove a value from context."""
+        if key in self._data:
+            del self._data[key]
+            self._mark_stale(1)
+            self._encoded.pop(key, None)
+            self._version += 1
+            return True
+        return False
+
+    def clear(self, pattern: str = "*") -> int:
+        """Clear values matching a glob pattern. Returns count of cleared items."""
+        self._version += 1
+        self._encoded.clear()
+        if pattern == "*":
+            count = len(self._data)
+            self._data.clear()
+            self._index = None
+            return count
+
+        if not _GLOB_CHARS.search(pattern):
+            # A literal key needs no scan
+            to_delete = [pattern] if pattern in self._data else []
+        elif pattern.endswith("*") and not _GLOB_CHARS.search(pattern[:-1]):
+            to_delete = self._key_index().starting_with(pattern[:-1], self._data)
+        elif pattern.startswith("*") and not _GLOB_CHARS.search(pattern[1:]):
+            to_delete = self._key_index().ending_with(pattern[1:], self._data)
+        else:
+            match = _glob_matcher(pattern)
+            to_delete = [k for k in self._data if match(k)]
+
+        for key in to_delete:
+            del self._data[key]
+        self._mark_stale(len(to_delete))
+        return len(to_delete)
+
+    def _key_index(self) -> _KeyIndex:
+        if self._index is None:
+            self._index = _KeyIndex(self._data)
+        return self._index
+
+    def _mark_stale(self, count: int) -> None:
+        index = self._index
+        if index is not None:
+            index.stale += count
+            if index.backlog() > len(self._data):
+                self._index = None
+
+    def get_step_output(self, step_id: str, output_name: str) -> Optional[str]:
+        """Get output from a previous step."""
+        step = self._steps.get(step_id, {})
+        return step.get("outputs", {}).get(output_name)
+
+
+_GLOB_CHARS = re.compile(r"[*?[]")
+
+
+@lru_cache(maxsize=256)
+def _glob_matcher(pattern: str):
+    """Compile a glob pattern once instead of on every fnmatch() call."""
+    return re.compile(fnmatch.translate(pattern)).match
+
+
+class AssertionResult:
+    """Result of a custom assertion."""
+
+    __slots__ = ("success", "message", "actual", "expected")
+
+    def __init__(
+        self,
+        success: bool,
+        message: Optional[str] = None,
+        actual: Optional[Any] = None,
+        expected: Optional[Any] = None,
+    ):
+        self.success = success
+        self.message = message
+        self.actual = actual
+        self.expected = expected
+
+    def to_dict(self) -> Dict[str, Any]:
+        if not self.success:
+            # Failures carry all fields; consumers already accept nulls
+            return {
+                "success": self.success,
+                "message": self.message,
+                "actual": self.actual,
+                "expected": self.expected,
+            }
+        if self.message is None and self.actual is None and self.expected is None:
+            # The common AssertionResult.passed() case
+            return {"success": self.success}
+
+        result = {"success": self.success}
+        if self.message is not None:
+            result["message"] = self.message
+        if self.actual is not None:
+            result["actual"] = self.actual
+        if self.expected is not None:
+            result["expected"] = self.expected
+        return result
+
+    @staticmethod
+    def passed(message: Optional[str] = None) -> "AssertionResult":
+        return AssertionResult(success=True, message=message)
+
+    @staticmethod
+    def failed(
+        message: str,
+        actual: Optional[Any] = None,
+        expected: Optional[Any] = None,
+    ) -> "AssertionResult":
+        return AssertionResult(
+            success=False, message=message, actual=actual, expected=expected
+        )
+
+    @staticmethod
+    def coerce(result: Any) -> "AssertionResult":
+        """Normalize an assertion's return value (AssertionResult, dict or bool)."""
+        if isinstance(result, AssertionResult):
+            return result
+        if isinstance(result, dict):
+            return AssertionResult(
+                success=result.get("success", True),
+                message=result.get("message"),
+                actual=result.get("actual"),
+                expected=result.get("expected"),
+            )
+        return AssertionResult(success=bool(result))
+
+
+class FunctionInfo:
+    """Information about a registered function."""
+
+    __slots__ = ("name", "description")
+
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+
+    def to_dict(self) -> Dict[str, str]:
+        return {"name": self.name, "description": self.description}
+
+
+def _param_defaults(fn: Callable, names: Sequence[str]) -> List[Any]:
+    """Defaults declared by ``fn`` for the given parameter names (else None)."""
+    try:
+        parameters = inspect.signature(fn).parameters
+    except (TypeError, ValueError):
+        return [None] * len(names)
+    defaults = []
+    for name in names:
+        param = parameters.get(name)
+        if param is None or param.default is param.empty:
+            defaults.append(None)
+        else:
+            defaults.append(param.default)
+    return defaults
+
+
+def _make_trampoline(
+    fn: Callable,
+    names: Sequence[str],
+    pass_ctx: bool = True,
+    coerce: Optional[Callable[[Any], Any]] = None,
+) -> Callable[[Dict[str, Any], Context], Any]:
+    """Generate ``(args, ctx) -> fn(args.get(name, default), ..., ctx)``.
+
+    The argument unpacking is emitted as straight-line code specialized for
+    ``fn``, so calls skip a generic loop over parameter names. The callable
+    and the defaults are bound as default arguments, i.e. fast locals.
+    If ``coerce`` is given, every argument is passed through it first.
+    """
+    defaults = _param_defaults(fn, names)
+    namespace: Dict[str, Any] = {"_f": fn, "_c": coerce}
+    bindings = ["_f=_f"]
+    if coerce is not None:
+        bindings.append("_c=_c")
+    call_args = []
+    for i, name in enumerate(names):
+        bindings.append(f"_d{i}=_d{i}")
+        arg = f"_get({name!r}, _d{i})"
+        call_args.append(arg if coerce is None else f"_c({arg})")
+        namespace[f"_d{i}"] = defaults[i]
+    if pass_ctx:
+        call_args.append("ctx")
+
+    source = (
+        f"def trampoline(args, ctx, {', '.join(bindings)}):\n"
+        f"    _get = args.get\n"
+        f"    return _f({', '.join(call_args)})\n"
+    )
+    filename = f"<trampoline {getattr(fn, '__qualname__', fn)!s}>"
+    exec(compile(source, filename, "exec"), namespace)
+    return namespace["trampoline"]
+
+
+class TieredCallable:
+    """Numeric kernel that is promoted to a Numba-compiled version once hot.
+
+    The kernel takes named scalar parameters (``def add(a, b)``) rather than
+    ``(args, ctx)``; JSON-RPC args are unpacked by parameter name. The first
+    ``hot_threshold`` calls run in Python, after which the kernel is compiled
+    with ``numba.njit``. If Numba is unavailable or cannot type the kernel,
+    it keeps running as plain Python.
+
+    Only kernels whose parameters are all annotated ``float`` are compiled,
+    and their arguments are converted with ``float()`` on both paths. Numba
+    would type JSON integers as int64 and let them wrap around silently,
+    where Python integers never overflow.
+    """
+
+    def __init__(self, kernel: Callable, hot_threshold: int = 8):
+        self.kernel = kernel
+        self.hot_threshold = hot_threshold
+        self.calls = 0
+        params = list(inspect.signature(kernel).parameters.values())
+        self._names = [param.name for param in params]
+        # String annotations come from `from __future__ import annotations`
+        self._coerce = (
+            float
+            if all(param.annotation in (float, "float") for param in params)
+            else None
+        )
+        self._call = _make_trampoline(
+            kernel, self._names, pass_ctx=False, coerce=self._coerce
+        )
+        self._jitted_call: Optional[Callable] = None
+        # Replaced by numba's NumbaError once it is imported in _promote
+        self._numba_error: type = Exception
+        self._eligible = self._coerce is not None
+        if hot_threshold <= 0:
+            self._promote()
+
+    def _promote(self) -> None:
+        if not self._eligible:
+            return
+        numba = _numba()
+        if numba is None:
+            self._eligible = False
+            return
+        njit, self._numba_error = numba
+        try:
+            jitted = njit(cache=True)(self.kernel)
+        except Exception:
+            # e.g. kernels defined without a source file cannot be cached
+            self._eligible = False
+            return
+        self._jitted_call = _make_trampoline(
+            jitted, self._names, pass_ctx=False, coerce=self._coerce
+        )
+
+    def __call__(self, args: Dict[str, Any], ctx: Context) -> Any:
+        jitted_call = self._jitted_call
+        if jitted_call is not None:
+            try:
+                return jitted_call(args, ctx)
+            except self._numba_error:
+                # Not compilable for these argument types: stay in Python
+                self._jitted_call = None
+                self._eligible = False
+                return self._call(args, ctx)
+
+        if self._eligible:
+            self.calls += 1
+            if self.calls >= self.hot_threshold:
+                self._promote()
+        return self._call(args, ctx)
+
+
+class PureCallable:
+    """Memoizes a pure function or assertion on its canonical JSON arguments.
+
+    Cached results are tagged with the context and data version they were
+    computed at and are only reused while that data is unchanged. Results of calls that
+    themselves set, remove or clear context values are never cached.
+    """
+
+    __slots__ = ("fn", "maxsize", "_cache")
+
+    def __init__(self, fn: Callable, maxsize: int = 1024):
+        self.fn = fn
+        self.maxsize = maxsize
+        self._cache: "OrderedDict[str, Tuple[Context, int, Any]]" = OrderedDict()
+
+    def __call__(self, args: Any, ctx: Context) -> Any:
+        try:
+            key = json.dumps(args, sort_keys=True, separators=(",", ":"))
+        except (TypeError, ValueError):
+            return self.fn(args, ctx)
+
+        cache = self._cache
+        version = ctx._version
+        entry = cache.get(key)
+        if entry is not None and entry[1] == version and entry[0] is ctx:
+            cache.move_to_end(key)
+            return entry[2]
+
+        result = self.fn(args, ctx)
+        if ctx._version == version:
+            cache[key] = (ctx, version, result)
+            cache.move_to_end(key)
+            if len(cache) > self.maxsize:
+                cache.popitem(last=False)
+        return result
+
+
+class Registry:
+    """Registry of user-defined functions, assertions, and hooks."""
+
+    __slots__ = (
+        "context",
+        "_functions",
+        "_assertions",
+        "_vectorized",
+        "_hooks",
+        "_functions_cache",
+        "_assertions_cache",
+        "_functions_json",
+        "_assertions_json",
+    )
+
+    def __init__(self):
+        # Names are interned and each entry keeps the callable next to its
+        # info, so a call is a single lookup on a pointer-comparable key.
+        self._functions: Dict[str, Tuple[Callable, FunctionInfo]] = {}
+        self._assertions: Dict[str, Tuple[Callable, FunctionInfo]] = {}
+        self._vectorized: Dict[str, Callable] = {}
+        self._hooks: Dict[str, Callable] = {}
+        # list_functions/list_assertions results, rebuilt after registration
+        self._functions_cache: Optional[list] = None
+        self._assertions_cache: Optional[list] = None
+        self._functions_json: Optional[bytes] = None
+        self._assertions_json: Optional[bytes] = None
+        self.context = Context()
+
+    # Read-only views for code that inspected the old public dicts. Entries
+    # are the callables actually dispatched, i.e. called as ``fn(args, ctx)``
+    # (``fn(ctx)`` for hooks); register new ones through the decorators.
+
+    @property
+    def functions(self) -> Mapping[str, Callable]:
+        return MappingProxyType(
+            {name: fn for name, (fn, _) in self._functions.items()}
+        )
+
+    @property
+    def assertions(self) -> Mapping[str, Callable]:
+        return MappingProxyType(
+            {name: fn for name, (fn, _) in self._assertions.items()}
+        )
+
+    @property
+    def hooks(self) -> Mapping[str, Callable]:
+        return MappingProxyType(dict(self._hooks))
+
+    def function(
+        self,
+        name: Optional[str] = None,
+        description: Optional[str] = None,
+        numba: bool = False,
+        hot_threshold: int = 8,
+        pure: bool = False,
+        params: Optional[Sequence[str]] = None,
+    ):
+        """Decorator to register a function.
+
+        The name defaults to the function's name and the description to its
+        docstring. With ``numba=True`` the function is a numeric kernel taking
+        named scalar parameters, compiled only if they are all annotated
+        ``float``; see TieredCallable. ``hot_threshold=0`` compiles it at
+        registration instead of after the first calls.
+        ``pure=True`` memoizes results per arguments; see PureCallable.
+
+        ``params=("a", "b")`` registers ``fn(a, b, ctx)`` instead of
+        ``fn(args, ctx)``: a generated trampoline passes ``args["a"]`` and
+        ``args["b"]`` positionally, falling back to ``fn``'s own defaults.
+        """
+
+        def decorator(fn: Callable) -> Callable:
+            key = sys.intern(name or fn.__name__)
+            if numba:
+                impl = TieredCallable(fn, hot_threshold)
+            elif params is not None:
+                impl = _make_trampoline(fn, params)
+            else:
+                impl = fn
+            if pure:
+                impl = PureCallable(impl)
+            info = FunctionInfo(key, _describe(fn, description))
+            self._functions[key] = (impl, info)
+            self._functions_cache = None
+            self._functions_json = None
+            return fn
+
+        return decorator
+
+    def assertion(
+        self,
+        name: Optional[str] = None,
+        description: Optional[str] = None,
+        pure: bool = False,
+        numeric: bool = False,
+    ):
+        """Decorator to register an assertion.
+
+        ``numeric=True`` marks an element-wise assertion over numeric params
+        (e.g. ``return params["actual"] == params["expected"]``). Batches of it
+        are evaluated in one call on NumPy arrays; see call_assertion_batch.
+        """
+
+        def decorator(fn: Callable) -> Callable:
+            key = sys.intern(name or fn.__name__)
+            impl = PureCallable(fn) if pure else fn
+            info = FunctionInfo(key, _describe(fn, description))
+            self._assertions[key] = (impl, info)
+            self._assertions_cache = None
+            self._assertions_json = None
+            if numeric:
+                self._vectorized[key] = fn
+            else:
+                self._vectorized.pop(key, None)
+            return fn
+
+        return decorator
+
+    def hook(self, name: str):
+        """Decorator to register a lifecycle hook."""
+
+        def decorator(fn: Callable) -> Callable:
+            self._hooks[sys.intern(name)] = fn
+            return fn
+
+        return decorator
+
+    # The call_* methods run against ``ctx`` when given (serve() passes the
+    # context it was started with) and against ``self.context`` otherwise.
+
+    def call_function(
+        self, name: str, args: Any, ctx: Optional[Context] = None
+    ) -> Any:
+        entry = self._functions.get(name)
+        if entry is None:
+            available = ", ".join(self._functions)
+            raise ValueError(f"Function not found: {name}. Available: {available}")
+        return entry[0](args, self.context if ctx is None else ctx)
+
+    def call_assertion(
+        self, name: str, params: Dict[str, Any], ctx: Optional[Context] = None
+    ) -> AssertionResult:
+        entry = self._assertions.get(name)
+        if entry is None:
+            return self._assertion_not_found(name)
+        return _run_assertion(entry[0], params, self.context if ctx is None else ctx)
+
+    def _assertion_not_found(self, name: Any) -> AssertionResult:
+        available = ", ".join(self._assertions)
+        return AssertionResult.failed(
+            f"Assertion not found: {name}. Available: {available}"
+        )
+
+    def call_assertion_batch(
+        self, calls: List[Dict[str, Any]], ctx: Optional[Context] = None
+    ) -> List[Dict[str, Any]]:
+        """Run many ``{"name", "params"}`` assertions, returning result dicts.
+
+        Calls to numeric assertions are grouped by name and evaluated with a
+        single vectorized call when NumPy is available and every row has the
+        same numeric params. Anything else runs one call at a time, with each
+        name resolved once per batch. Malformed entries fail on their own
+        instead of failing the whole batch.
+        """
+        if ctx is None:
+            ctx = self.context
+        results: List[Optional[Dict[str, Any]]] = [None] * len(calls)
+
+        groups: Dict[str, List[int]] = {}
+        if self._vectorized:
+            for i, call in enumerate(calls):
+                if isinstance(call, dict):
+                    name = call.get("name")
+                    if isinstance(name, str) and name in self._vectorized:
+                        groups.setdefault(name, []).append(i)
+        # NumPy is only imported once a batch actually has a group to vectorize
+        if groups and _numpy() is not None:
+            for name, indices in groups.items():
+                rows = [calls[i].get("params", {}) for i in indices]
+                mask = _vectorized_mask(self._vectorized[name], rows, ctx)
+                if mask is None:
+                    continue
+                passed = AssertionResult(success=True).to_dict()
+                failed = AssertionResult(success=False).to_dict()
+                for i, ok in zip(indices, mask.tolist()):
+                    results[i] = dict(passed if ok else failed)
+
+        assertions = self._assertions
+        # Name -> callable, or the not-found result for unknown names
+        resolved: Dict[str, Any] = {}
+        for i, call in enumerate(calls):
+            if results[i] is not None:
+                continue
+            name = call.get("name") if isinstance(call, dict) else None
+            if not isinstance(name, str):
+                results[i] = AssertionResult.failed(
+                    f"Invalid assertion call: {call!r}"
+                ).to_dict()
+                continue
+            target = resolved.get(name)
+            if target is None:
+                entry = assertions.get(name)
+                target = resolved[name] = (
+                    entry[0] if entry is not None else self._assertion_not_found(name)
+                )
+            if isinstance(target, AssertionResult):
+                results[i] = target.to_dict()
+            else:
+                params = call.get("params", {})
+                results[i] = _run_assertion(target, params, ctx).to_dict()
+        return results
+
+    def call_hook(self, name: str, ctx: Optional[Context] = None) -> None:
+        hook = self._hooks.get(name)
+        if hook is not None:
+            hook(self.context if ctx is None else ctx)
+
+    def list_functions(self) -> list:
+        """Registered functions as dicts. The list is cached; do not mutate it."""
+        if self._functions_cache is None:
+            self._functions_cache = [
+                info.to_dict() for _, info in self._functions.values()
+            ]
+        return self._functions_cache
+
+    def list_assertions(self) -> list:
+        """Registered assertions as dicts. The list is cached; do not mutate it."""
+        if self._assertions_cache is None:
+            self._assertions_cache = [
+                info.to_dict() for _, info in self._assertions.values()
+            ]
+        return self._assertions_cache
+
+    def list_functions_json(self) -> bytes:
+        """list_functions() encoded as JSON, cached alongside the list."""
+        if self._functions_json is None:
+            self._functions_json = _dumps(self.list_functions())
+        return self._functions_json
+
+    def list_assertions_json(self) -> bytes:
+        """list_assertions() encoded as JSON, cached alongside the list."""
+        if self._assertions_json is None:
+            self._assertions_json = _dumps(self.list_assertions())
+        return self._assertions_json
+
+    def list_hooks(self) -> list:
+        return list(self._hooks)
+
+
+def _run_assertion(fn: Callable, params: Any, ctx: Context) -> AssertionResult:
+    try:
+        return AssertionResult.coerce(fn(params, ctx))
+    except Exception as e:
+        return AssertionResult.failed(str(e))
+
+
+def _vectorized_mask(fn: Callable, rows: List[Any], ctx: Context) -> Optional[Any]:
+    """Evaluate an element-wise assertion over all rows at once.
+
+    Returns a boolean array with one entry per row, or None when the rows
+    cannot be turned into numeric columns or the assertion does not produce
+    a per-row result.
+    """
+    np = _numpy()
+    if not all(isinstance(row, dict) for row in rows):
+        return None
+    keys = rows[0].keys()
+    if not keys or any(row.keys() != keys for row in rows):
+        return None
+
+    columns = {}
+    for key in keys:
+        column = np.asarray([row[key] for row in rows])
+        if column.dtype.kind not in "biuf":
+            return None
+        columns[key] = column
+
+    try:
+        mask = np.asarray(fn(columns, ctx), dtype=bool)
+    except Exception:
+        return None
+    if mask.shape != (len(rows),):
+        return None
+    return mask
+
+
+def _describe(fn: Callable, description: Optional[str]) -> str:
+    if description is not None:
+        return description
+    return getattr(fn, "__doc__", "") or ""
+
+
+# ==============================================================================
+# JSON-RPC Server Implementation
+# ==============================================================================
+
+
+class JsonRpcError(Exception):
+    def __init__(self, code: int, message: str):
+        self.code = code
+        self.message = message
+
+
+def _handle_fn_call(params: Dict[str, Any], registry: Registry, ctx: Context) -> Any:
+    name = params.get("name")
+    args = params.get("args", {})
+    result = registry.call_function(name, args, ctx)
+    return {"result": result}
+
+
+def _handle_ctx_get(params: Dict[str, Any], registry: Registry, ctx: Context) -> Any:
+    key = params.get("key")
+    encoded = ctx.get_json(key)
+    if encoded is not None:
+        return RawJson(b'{"value":' + encoded + b"}")
+    value = ctx.get(key)
+    return {"value": value}
+
+
+def _handle_ctx_set(params: Dict[str, Any], registry: Registry, ctx: Context) -> Any:
+    key = params.get("key")
+    value = params.get("value")
+    ctx.set(key, value)
+    return {}
+
+
+def _handle_ctx_clear(params: Dict[str, Any], registry: Registry, ctx: Context) -> Any:
+    pattern = params.get("pattern", "*")
+    cleared = ctx.clear(pattern)
+    return {"cleared": cleared}
+
+
+def _handle_ctx_set_execution_info(
+    params: Dict[str, Any], registry: Registry, ctx: Context
+) -> Any:
+    ctx.run_id = params.get("runId", "")
+    ctx.job_name = params.get("jobName", "")
+    ctx.step_name = params.get("stepName", "")
+    return {}
+
+
+def _handle_ctx_sync_step_outputs(
+    params: Dict[str, Any], registry: Registry, ctx: Context
+) -> Any:
+    step_id = params.get("stepId")
+    outputs = params.get("outputs", {})
+    if step_id not in ctx._steps:
+        ctx._steps[step_id] = {"outputs": {}}
+    ctx._steps[step_id]["outputs"].update(outputs)
+    return {}
+
+
+def _handle_hook_call(params: Dict[str, Any], registry: Registry, ctx: Context) -> Any:
+    hook_name = params.get("hook")
+    registry.call_hook(hook_name, ctx)
+    return {}
+
+
+def _handle_assert_custom(
+    params: Dict[str, Any], registry: Registry, ctx: Context
+) -> Any:
+    name = params.get("name")
+    assertion_params = params.get("params", {})
+    result = registry.call_assertion(name, assertion_params, ctx)
+    return result.to_dict()
+
+
+def _handle_assert_custom_batch(
+    params: Any, registry: Registry, ctx: Context
+) -> Any:
+    # Accept either positional params ([{name, params}, ...]) or
+    # {"assertions": [{name, params}, ...]}
+    calls = params if isinstance(params, list) else params.get("assertions", [])
+    return {"results": registry.call_assertion_batch(calls, ctx)}
+
+
+def _handle_list_functions(
+    params: Dict[str, Any], registry: Registry, ctx: Context
+) -> Any:
+    return RawJson(b'{"functions":' + registry.list_functions_json() + b"}")
+
+
+def _handle_list_assertions(
+    params: Dict[str, Any], registry: Registry, ctx: Context
+) -> Any:
+    return RawJson(b'{"assertions":' + registry.list_assertions_json() + b"}")
+
+
+def _handle_clock_sync(params: Dict[str, Any], registry: Registry, ctx: Context) -> Any:
+    ctx.clock = {
+        "virtual_time_ms": params.get("virtual_time_ms"),
+        "virtual_time_iso": params.get("virtual_time_iso"),
+        "frozen": params.get("frozen"),
+    }
+    return {}
+
+
+# Method name -> handler. Never modified after import; dispatch binds its
+# .get once so a lookup is a single dict probe.
+_METHODS: Dict[str, Callable[[Dict[str, Any], Registry, Context], Any]] = {
+    "fn.call": _handle_fn_call,
+    "ctx.get": _handle_ctx_get,
+    "ctx.set": _handle_ctx_set,
+    "ctx.clear": _handle_ctx_clear,
+    "ctx.setExecutionInfo": _handle_ctx_set_execution_info,
+    "ctx.syncStepOutputs": _handle_ctx_sync_step_outputs,
+    "hook.call": _handle_hook_call,
+    "assert.custom": _handle_assert_custom,
+    "assert.customBatch": _handle_assert_custom_batch,
+    "list_functions": _handle_list_functions,
+    "list_assertions": _handle_list_assertions,
+    "clock.sync": _handle_clock_sync,
+}
+_dispatch = _METHODS.get
+
+
+def dispatch(
+    method: str, params: Dict[str, Any], registry: Registry, ctx: Context
+) -> Any:
+    """Dispatch to the appropriate handler based on method name."""
+    handler = _dispatch(method)
+    if handler is None:
+        raise JsonRpcError(-32601, f"Method not found: {method}")
+    return handler(params, registry, ctx)
+
+
+def _error(request_id: Any, code: int, message: str) -> Dict[str, Any]:
+    return {
+        "jsonrpc": "2.0",
+        "id": request_id,
+        "error": {"code": code, "message": message},
+    }
+
+
+def handle_request(
+    request: Any, registry: Registry, ctx: Context, debug: bool = False
+) -> Dict[str, Any]:
+    """Handle a single JSON-RPC request.
+
+    Tracebacks for failing handlers are only printed in debug mode; otherwise
+    the error message just carries the exception type and text.
+    """
+    if not isinstance(request, dict):
+        return _error(None, -32600, "Invalid Request")
+
+    method = request.get("method", "")
+    params = request.get("params", {})
+    request_id = request.get("id")
+
+    try:
+        result = dispatch(method, params, registry, ctx)
+        return {"jsonrpc": "2.0", "id": request_id, "result": result}
+    except JsonRpcError as e:
+        return _error(request_id, e.code, e.message)
+    except Exception as e:
+        if debug:
+            traceback.print_exc(file=sys.stderr)
+        return _error(request_id, -32000, f"{type(e).__name__}: {e}")
+
+
+def handle_batch(
+    requests: List[Any], registry: Registry, ctx: Context, debug: bool = False
+) -> Any:
+    """Handle a JSON-RPC batch, omitting responses to notifications."""
+    if not requests:
+        return _error(None, -32600, "Invalid Request: empty batch")
+
+    responses = []
+    for request in requests:
+        response = handle_request(request, registry, ctx, debug)
+        # Notifications (no id) are executed but not answered
+        if not isinstance(request, dict) or "id" in request:
+            responses.append(response)
+    return responses
+
+
+def _encode(response: Any) -> bytes:
+    """Encode a response, reporting results that cannot be serialized.
+
+    RawJson results are spliced into the envelope without re-encoding.
+    """
+    if isinstance(response, list):
+        return b"[" + b",".join([_encode(item) for item in response]) + b"]"
+
+    result = response.get("result")
+    if type(result) is RawJson:
+        return b"".join(
+            [
+                b'{"jsonrpc":"2.0","id":',
+                _dumps(response["id"]),
+                b',"result":',
+                result.data,
+                b"}",
+            ]
+        )
+
+    try:
+        return _dumps(response)
+    except (TypeError, ValueError) as e:
+        return _dumps(
+            _error(response.get("id"), -32000, f"Result is not JSON serializable: {e}")
+        )
+
+
+def _read_lines(fd: int, chunk_size: int = 1 << 16) -> Iterator[bytes]:
+    """Yield lines (without the newline) read from a file descriptor.
+
+    Input is read in large os.read() chunks and split in userspace, so a burst
+    of pipelined requests is drained with a single syscall.
+    """
+    buffer = bytearray()
+    while True:
+        chunk = os.read(fd, chunk_size)
+        if not chunk:
+            break
+        # The buffered tail was already searched, only the new chunk can
+        # hold a newline; rescanning from 0 would make long lines quadratic
+        searched = len(buffer)
+        buffer += chunk
+        start = 0
+        end = buffer.find(b"\n", searched)
+        while end >= 0:
+            yield bytes(buffer[start:end])
+            start = end + 1
+            end = buffer.find(b"\n", start)
+        del buffer[:start]
+    if buffer:
+        yield bytes(buffer)
+
+
+def _iter_lines(stream: BinaryIO) -> Iterator[bytes]:
+    try:
+        fd = stream.fileno()
+    except (AttributeError, OSError):
+        # In-memory streams have no descriptor; iterate them directly
+        return iter(stream)
+    return _read_lines(fd)
+
+
+def serve(
+    registry: Registry,
+    ctx: Optional[Context] = None,
+    stdin: Optional[BinaryIO] = None,
+    stdout: Optional[BinaryIO] = None,
+    debug: Optional[bool] = None,
+) -> None:
+    """Main server loop - reads JSON-RPC from stdin, writes to stdout.
+
+    Works on the raw byte streams: the decoder accepts UTF-8 bytes directly and
+    the response is flushed once per request (or batch) instead of per line.
+    ``debug`` defaults to the TESTING_ACTIONS_DEBUG=1 environment variable.
+    """
+    if ctx is None:
+        ctx = registry.context
+    if debug is None:
+        debug = os.environ.get("TESTING_ACTIONS_DEBUG") == "1"
+    out = stdout if stdout is not None else sys.stdout.buffer
+
+    # Hot callables are bound to locals once, outside the loop
+    write = out.write
+    flush = out.flush
+    loads = _loads
+    encode = _encode
+    handle = handle_request
+
+    for line in _iter_lines(stdin if stdin is not None else sys.stdin.buffer):
+        line = line.strip()
+        if not line:
+            continue
+
+        try:
+            request = loads(line)
+        except ValueError as e:
+            write(encode(_error(None, -32700, f"Parse error: {e}")) + b"\n")
+            flush()
+            continue
+
+        if isinstance(request, list):
+            response = handle_batch(request, registry, ctx, debug)
+            # A batch made up only of notifications gets no reply at all
+            if response == []:
+                continue
+        else:
+            response = handle(request, registry, ctx, debug)
+
+        write(encode(response) + b"\n")
+        flush()